@@ -2,8 +2,45 @@
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from .gmail import GMail,GMailWorker,GMailHandler
-from .message import Message
+import sys as _sys
+
+# Public classes are loaded lazily on first attribute access (PEP 562) so that
+# 'import gmail' (and 'python -mgmail.cli') does not pay for smtplib,
+# multiprocessing and the email.mime stack until they are actually needed
+_lazy = { 'GMail'           : 'gmail',
+          'GMailWorker'     : 'gmail',
+          'GMailHandler'    : 'gmail',
+          'PRIORITY_HIGH'   : 'gmail',
+          'PRIORITY_NORMAL' : 'gmail',
+          'PRIORITY_BULK'   : 'gmail',
+          'Message'         : 'message' }
+
+# Submodules are also loaded on first access ('gmail.gmail' etc.)
+_submodules = ('gmail','message','cli')
+
+# str() as 'from gmail import *' requires native strings in Python 2
+__all__ = [ str(n) for n in _lazy ]
+
+if _sys.version_info < (3,7):
+    # No module __getattr__ - import eagerly
+    from .gmail import GMail,GMailWorker,GMailHandler
+    from .gmail import PRIORITY_HIGH,PRIORITY_NORMAL,PRIORITY_BULK
+    from .message import Message
+else:
+    def __getattr__(name):
+        if name in _lazy or name in _submodules:
+            import importlib
+            if name in _submodules:
+                # Importing the submodule also sets it as a package attribute
+                return importlib.import_module('.' + name,__name__)
+            module = importlib.import_module('.' + _lazy[name],__name__)
+            value = getattr(module,name)
+            globals()[name] = value
+            return value
+        raise AttributeError("module %r has no attribute %r" % (__name__,name))
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy) | set(_submodules))
 
 version = "0.6.3"
 description = """
@@ -19,7 +56,8 @@ description = """
 
     GMail           - Basic interface to GMail SMTP service 
     GMailWorker     - Background worker to send messages asynchronously 
-                      (uses multiprocessing module)
+                      (uses multiprocessing module) with priority lanes
+                      (PRIORITY_HIGH/PRIORITY_NORMAL/PRIORITY_BULK)
     GMailHandler    - GMail handler for logging framework
     Message         - Wrapper around email.Message class simplifying
                       creation of email message objects
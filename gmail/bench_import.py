@@ -0,0 +1,72 @@
+
+"""
+    Import-time benchmark
+
+    Measures interpreter start-up cost for 'import gmail' and for the cli
+    ('python -mgmail.cli --help') against an eager import of all classes
+    plus smtplib/multiprocessing (the modules the pre-lazy package loaded
+    at import time). Each case is run in a fresh interpreter and the best
+    of N runs is reported.
+
+    Usage:
+
+        python -mgmail.bench_import [runs]
+
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os,subprocess,sys,timeit
+
+HEAVY = ('smtplib','multiprocessing','email.mime.multipart')
+
+CASES = [
+    ('python -c pass',          ['-c','pass']),
+    ('import gmail',            ['-c','import gmail']),
+    ('import gmail (eager)',    ['-c','import gmail,smtplib,multiprocessing; gmail.GMail; gmail.Message']),
+    ('python -mgmail.cli -h',   ['-m','gmail.cli','--help']),
+    ('gmail.cli -h (eager)',    ['-c','import sys; sys.argv = ["gmail.cli","--help"]; '
+                                      'import gmail.gmail,gmail.message,gmail.cli,smtplib,multiprocessing; '
+                                      'gmail.cli.cli()']),
+]
+
+def _env():
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in [env.get('PYTHONPATH')] if p])
+    return env
+
+def _run(args,env):
+    with open(os.devnull,'w') as devnull:
+        subprocess.check_call([sys.executable] + args,env=env,stdout=devnull)
+
+def _loaded(args,env):
+    """
+        Return heavy modules loaded after running 'args' ('-m' cases are
+        run through runpy so that sys.modules can be inspected afterwards)
+    """
+    if args[0] == '-m':
+        code = 'import runpy,sys; sys.argv = %r; runpy.run_module(%r,run_name="__main__",alter_sys=True)' % \
+                    ([str(a) for a in args[1:]],str(args[1]))
+    else:
+        code = args[1]
+    code = ('import sys\n'
+            'try:\n'
+            '    exec(%r)\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print("loaded:" + ",".join(m for m in %r if m in sys.modules))') % (str(code),HEAVY)
+    out = subprocess.check_output([sys.executable,'-c',code],env=env)
+    return out.decode('ascii').rsplit('loaded:',1)[1].strip() or '-'
+
+def bench(runs=20):
+    env = _env()
+    print("%-24s %10s   %s" % ('case','best (ms)','heavy modules loaded'))
+    for name,args in CASES:
+        best = min(timeit.repeat(lambda: _run(args,env),number=1,repeat=runs))
+        loaded = _loaded(args,env)
+        print("%-24s %10.1f   %s" % (name,best * 1000,loaded))
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
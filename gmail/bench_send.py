@@ -0,0 +1,84 @@
+
+"""
+    Send preparation benchmark
+
+    Measures the per-message CPU cost of preparing a message for sending
+    ('GMail.prepare') and of its individual steps:
+
+        recipients      - To/Cc/Bcc extraction (getaddresses - unchanged)
+        Message-ID      - make_msgid() (getfqdn() per call) against the
+                          cached domain used by 'prepare'
+        Date            - formatdate() against the per-second cached string
+
+    The 'build + prepare' rows include Message construction and compare
+    'GMail.prepare' with the previous uncached implementation - the
+    difference comes from the Message-ID and Date caching only. Serialising
+    a built message ('as_string') is shown for comparison. No SMTP
+    connection is made.
+
+    Usage:
+
+        python -mgmail.bench_send [messages]
+
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys,time,timeit
+
+from email.utils import formatdate,make_msgid,getaddresses
+
+from .gmail import GMail,_formatdate,_make_msgid
+from .message import Message
+
+def _recipients(message):
+    return [ addr[1] for addr in getaddresses((message.get_all('To') or []) +
+                                              (message.get_all('Cc') or []) +
+                                              (message.get_all('Bcc') or [])) ]
+
+def _prepare_uncached(gmail,message,rcpt=None):
+    # Previous 'GMail.send' preparation (getfqdn/formatdate per message)
+    if rcpt is None:
+        rcpt = _recipients(message)
+    if message['From'] is None:
+        message['From'] = gmail.sender
+    if message['Reply-To'] is None:
+        message['Reply-To'] = gmail.sender
+    if message['Date'] is None:
+        message['Date'] = formatdate(time.time(),localtime=True)
+    if message['Message-ID'] is None:
+        message['Message-ID'] = make_msgid()
+    del message['Bcc']
+    return rcpt
+
+def _message(i):
+    return Message('Bench Message #%d' % i,
+                   to='A User <a@xyz.com>, b@xyz.com',
+                   cc='C User <c@xyz.com>',
+                   bcc='d@xyz.com',
+                   text='Hello')
+
+def bench(n=2000):
+    gmail = GMail('A.User <user@gmail.com>','password')
+    built = []
+    cases = [ ('recipients',                lambda i: _recipients(built[i])),
+              ('Message-ID (uncached)',     lambda i: make_msgid()),
+              ('Message-ID',                lambda i: _make_msgid()),
+              ('Date (uncached)',           lambda i: formatdate(time.time(),localtime=True)),
+              ('Date',                      lambda i: _formatdate()),
+              ('build',                     lambda i: _message(i)),
+              ('build + prepare (uncached)',lambda i: _prepare_uncached(gmail,_message(i))),
+              ('build + prepare',           lambda i: gmail.prepare(_message(i))),
+              ('as_string (built)',         lambda i: built[i].as_string()) ]
+    print("%-28s %12s" % ('case','us/message'))
+    for name,f in cases:
+        best = None
+        for r in range(3):
+            built[:] = [ _message(i) for i in range(n) ]
+            t = timeit.timeit(lambda: [ f(i) for i in range(n) ],number=1)
+            best = t if best is None else min(best,t)
+        print("%-28s %12.1f" % (name,best / n * 1e6))
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
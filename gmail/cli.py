@@ -4,9 +4,6 @@ from __future__ import unicode_literals
 
 import os 
 
-from .gmail import GMail
-from .message import Message
-
 def cli():
     import argparse,getpass,mimetypes,sys
 
@@ -38,6 +35,10 @@ def cli():
     if results.body is None and results.html is None:
         results.body = sys.stdin.read()
 
+    # Deferred until arguments are parsed so '--help'/usage errors stay fast
+    from .gmail import GMail
+    from .message import Message
+
     gmail = GMail(username=results.username,
                   password=results.password,
                   debug=results.debug)
@@ -3,20 +3,42 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import logging
-from multiprocessing import Process
-try:
-    from multiprocessing import SimpleQueue
-except ImportError:
-    from multiprocessing.queues import SimpleQueue
 import os.path
-import smtplib
+import sys
 import time
 
 from email.utils import formatdate,make_msgid,getaddresses,parseaddr
-from smtplib import SMTPResponseException,SMTPServerDisconnected,SMTPAuthenticationError
 
 from .message import Message
 
+# NOTE: smtplib and multiprocessing are imported where they are used rather
+#       than at module level to keep import/startup time down (see 'connect',
+#       'GMailWorker.__init__')
+
+# Domain used for Message-ID headers - make_msgid() otherwise calls
+# socket.getfqdn() (which may do a DNS lookup) for every message
+_msgid_domain = None
+
+# (second,formatted date) - the Date header only has one second resolution
+_date_cache = (None,None)
+
+def _make_msgid():
+    global _msgid_domain
+    if sys.version_info[0] == 2:
+        # No domain argument in Python 2
+        return make_msgid()
+    if _msgid_domain is None:
+        import socket
+        _msgid_domain = socket.getfqdn()
+    return make_msgid(domain=_msgid_domain)
+
+def _formatdate():
+    global _date_cache
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache = (now,formatdate(now,localtime=True))
+    return _date_cache[1]
+
 class GMail(object):
 
     """
@@ -64,6 +86,7 @@ class GMail(object):
         """
             Connect to GMail SMTP service using smtplib
         """
+        import smtplib
         self.session = smtplib.SMTP(self.server,self.port)
         self.session.set_debuglevel(self.debug)
         self.session.ehlo()
@@ -82,6 +105,20 @@ class GMail(object):
         # Check if connected and connect if false
         if not self.is_connected():
             self.connect()
+        rcpt = self.prepare(message,rcpt)
+
+        # Send message
+        self.session.sendmail(self.sender,rcpt,message.as_string())
+
+    def prepare(self,message,rcpt=None):
+        """
+            message         : email.Message instance
+            rcpt            : List of recipients (normally parsed from
+                              To/Cc/Bcc fields)
+
+            Extract recipients and fill in default headers prior to sending
+            (called by 'send') - returns list of recipients
+        """
         # Extract recipients
         if rcpt is None:
             rcpt = [ addr[1] for addr in getaddresses((message.get_all('To') or []) + 
@@ -94,13 +131,11 @@ class GMail(object):
         if message['Reply-To'] is None:
             message['Reply-To'] = self.sender
         if message['Date'] is None:
-            message['Date'] = formatdate(time.time(),localtime=True)
+            message['Date'] = _formatdate()
         if message['Message-ID'] is None:
-            message['Message-ID'] = make_msgid()
+            message['Message-ID'] = _make_msgid()
         del message['Bcc']
-
-        # Send message
-        self.session.sendmail(self.sender,rcpt,message.as_string())
+        return rcpt
 
     def is_connected(self):
         """
@@ -111,6 +146,7 @@ class GMail(object):
         """
         if self.session is None:
             return False
+        from smtplib import SMTPResponseException,SMTPServerDisconnected
         try:
             rcode,msg = self.session.noop()
             if rcode == 250:
@@ -136,14 +172,96 @@ class GMail(object):
         """
         self.close()
 
-def _gmail_worker(username,password,queue,debug=False):
+# Priority lanes for GMailWorker (lower value is more urgent)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+PRIORITY_NAMES = ('high','normal','bulk')
+
+# Default lane weights - under contention lanes are served in proportion
+# to their weight (smooth weighted round-robin)
+PRIORITY_WEIGHTS = (8,4,1)
+
+class _LaneScheduler(object):
+
+    """
+        Per-process scheduler used by '_gmail_worker'
+
+        A reader thread drains the shared queue into per-lane deques (so the
+        scheduler can see the backlog) and 'get' returns the next item using
+        smooth weighted round-robin across the non-empty lanes. A 'QUIT' item
+        is only returned once all lanes are empty.
+    """
+
+    def __init__(self,queue,weights):
+        import collections,threading
+        self.queue = queue
+        self.weights = weights
+        self.lanes = [ collections.deque() for w in weights ]
+        self.current = [ 0 for w in weights ]
+        self.closing = False
+        self.cond = threading.Condition()
+        self.reader = threading.Thread(target=self._read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def _read(self):
+        while True:
+            try:
+                item = self.queue.get()
+                quit = item[0] == 'QUIT'
+                with self.cond:
+                    if not quit:
+                        self.lanes[item[2]].append(item)
+            except Exception:
+                # Queue closed (parent exited) or bad item - drain and exit
+                # rather than leaving 'get' waiting forever
+                quit = True
+            with self.cond:
+                self.closing = self.closing or quit
+                self.cond.notify()
+            if quit:
+                break
+
+    def get(self):
+        with self.cond:
+            ready = [ i for i,lane in enumerate(self.lanes) if lane ]
+            while not ready:
+                if self.closing:
+                    return ('QUIT',None,None,None)
+                self.cond.wait()
+                ready = [ i for i,lane in enumerate(self.lanes) if lane ]
+            total = 0
+            for i in ready:
+                self.current[i] += self.weights[i]
+                total += self.weights[i]
+            lane = max(ready,key=lambda i: self.current[i])
+            self.current[lane] -= total
+            item = self.lanes[lane].popleft()
+            if not self.lanes[lane]:
+                # Idle lanes don't carry credit/debt into the next busy period
+                self.current[lane] = 0
+            return item
+
+def _gmail_worker(username,password,queue,debug=False,weights=None,stats=None):
+    from smtplib import SMTPResponseException,SMTPServerDisconnected
     gmail = GMail(username,password,debug)
     gmail.connect()
+    # Reserved workers only ever see a single lane and read the queue directly
+    get = _LaneScheduler(queue,weights).get if weights else queue.get
     while True:
         try:
-            msg,rcpt = queue.get()
+            msg,rcpt,priority,queued = get()
             if msg == 'QUIT':
                 break
+            if stats is not None:
+                # Record queue wait for lane (count/total/max)
+                wait = time.time() - queued
+                with stats.get_lock():
+                    stats[priority * 3] += 1
+                    stats[priority * 3 + 1] += wait
+                    stats[priority * 3 + 2] = max(stats[priority * 3 + 2],wait)
             gmail.send(msg,rcpt)
         except SMTPServerDisconnected:
             gmail.connect()
@@ -163,6 +281,12 @@ class GMailWorker(object):
         the multiprocessing module) which accepts messages through a 
         simple queue. No feedback is provided.
 
+        Messages can be sent with a priority (PRIORITY_HIGH, PRIORITY_NORMAL,
+        PRIORITY_BULK) - the worker serves the lanes by weighted fairness so
+        that urgent mail is not stuck behind a bulk backlog. Additional
+        worker processes (each with its own SMTP session) can be reserved
+        for PRIORITY_HIGH messages.
+
         The worker object should be closed on exit (will otherwise prevent
         the interpreter from exiting).
 
@@ -173,10 +297,12 @@ class GMailWorker(object):
         >>> gmail_worker = GMailWorker('A.User <user@gmail.com>','password')
         >>> msg = Message('Test Message',to='xyz <xyz@xyz.com',text='Hello')
         >>> gmail_worker.send(msg)
+        >>> gmail_worker.send(urgent,priority=PRIORITY_HIGH)
+        >>> gmail_worker.stats()
         >>> gmail_worker.close()
 
     """
-    def __init__(self,username,password,debug=False):
+    def __init__(self,username,password,debug=False,weights=PRIORITY_WEIGHTS,reserved=0):
         """
             GMail SMTP connection worker
 
@@ -188,6 +314,10 @@ class GMailWorker(object):
 
             password    : GMail password
             debug       : Debug flag (passed to smtplib)
+            weights     : Relative weight of each priority lane (indexed by
+                          priority - default PRIORITY_WEIGHTS)
+            reserved    : Number of additional worker processes reserved for
+                          PRIORITY_HIGH messages (default 0)
 
             Runs '_gmail_worker' helper in background using multiprocessing
             module.
@@ -195,28 +325,73 @@ class GMailWorker(object):
             '_gmail_worker' loops listening for new message objects on the
             shared queue and sends these using the GMail SMTP connection.
         """
+        from multiprocessing import Array,Process
+        try:
+            from multiprocessing import SimpleQueue
+        except ImportError:
+            from multiprocessing.queues import SimpleQueue
+        weights = tuple(weights)
+        if len(weights) != len(PRIORITY_NAMES) or min(weights) <= 0:
+            raise ValueError("weights must be %d positive values" % len(PRIORITY_NAMES))
+        # Per-lane queue wait statistics (count/total/max) shared with workers
+        self.stats_array = Array('d',len(PRIORITY_NAMES) * 3)
         self.queue = SimpleQueue()
-        self.worker = Process(target=_gmail_worker,args=(username,password,self.queue,debug))
+        self.worker = Process(target=_gmail_worker,
+                              args=(username,password,self.queue,debug,weights,self.stats_array))
         self.worker.start()
-
-    def send(self,message,rcpt=None):
+        self.reserved_queue = SimpleQueue() if reserved else None
+        self.reserved_workers = [ Process(target=_gmail_worker,
+                                          args=(username,password,self.reserved_queue,debug,
+                                                None,self.stats_array))
+                                    for i in range(reserved) ]
+        for w in self.reserved_workers:
+            w.start()
+
+    def send(self,message,rcpt=None,priority=PRIORITY_NORMAL):
         """
             message         : email.Message instance
             rcpt            : List of recipients (normally parsed from
                               To/Cc/Bcc fields)
+            priority        : Lane (PRIORITY_HIGH/PRIORITY_NORMAL/PRIORITY_BULK)
 
             Send message object via background worker
         """
-        self.queue.put((message,rcpt))
+        if not isinstance(priority,int) or not 0 <= priority < len(PRIORITY_NAMES):
+            raise ValueError("Invalid priority: %r" % (priority,))
+        if priority == PRIORITY_HIGH and self.reserved_queue is not None:
+            queue = self.reserved_queue
+        else:
+            queue = self.queue
+        queue.put((message,rcpt,priority,time.time()))
+
+    def stats(self):
+        """
+            Return per-lane queue wait statistics (time between 'send' and
+            the message being picked up by a worker) as a dict:
+
+                { 'high' : { 'count' : n, 'wait_avg' : s, 'wait_max' : s }, ... }
+        """
+        with self.stats_array.get_lock():
+            values = list(self.stats_array)
+        result = {}
+        for i,name in enumerate(PRIORITY_NAMES):
+            count,total,wait_max = values[i * 3:i * 3 + 3]
+            result[name] = { 'count' : int(count),
+                             'wait_avg' : total / count if count else 0.0,
+                             'wait_max' : wait_max }
+        return result
 
     def close(self):
         """
-            Close down background worker
+            Close down background worker(s) - queued messages are sent first
         """
-        self.queue.put(('QUIT',None))
+        self.queue.put(('QUIT',None,None,None))
+        for w in self.reserved_workers:
+            self.reserved_queue.put(('QUIT',None,None,None))
 
     def __del__(self):
-        self.close()
+        if hasattr(self,'queue'):
+            self.close()
 
 class GMailHandler(logging.Handler):
     """
@@ -238,6 +413,7 @@ class GMailHandler(logging.Handler):
 
     def __init__(self,username,password,to,bg=True):
         logging.Handler.__init__(self)
+        self.bg = bg
         if bg:
             self.gmail= GMailWorker(username,password)
         else:
@@ -254,7 +430,12 @@ class GMailHandler(logging.Handler):
             msg = Message(subject=self.subject_formatter.format(record).split("\n")[0],
                           to=self.to,
                           text=self.format(record))
-            self.gmail.send(msg)
+            if self.bg:
+                # Errors/alerts bypass any backlog in the background worker
+                self.gmail.send(msg,priority=PRIORITY_HIGH if record.levelno >= logging.ERROR
+                                                           else PRIORITY_NORMAL)
+            else:
+                self.gmail.send(msg)
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
@@ -6,7 +6,11 @@ import logging,os,unittest
 from email.mime.base import MIMEBase
 
 from .gmail import GMail,GMailWorker,GMailHandler,Message
+from .gmail import PRIORITY_HIGH,PRIORITY_NORMAL,PRIORITY_BULK,_LaneScheduler
 
+_live = bool(os.getenv('GMAIL_ACCOUNT') and os.getenv('GMAIL_PASSWD') and os.getenv('GMAIL_RCPT'))
+
+@unittest.skipUnless(_live,"Must set GMAIL_ACCOUNT, GMAIL_PASSWD, GMAIL_RCPT environment variables")
 class GMailTest(unittest.TestCase):
 
     def test_gmail(self):
@@ -45,6 +49,30 @@ class GMailTest(unittest.TestCase):
         gmail_worker.send(msg2)
         gmail_worker.close()
 
+    def test_worker_priority(self):
+        gmail_worker = GMailWorker(os.environ['GMAIL_ACCOUNT'],
+                                   os.environ['GMAIL_PASSWD'],
+                                   reserved=1)
+        for i in range(5):
+            gmail_worker.send(Message('GMailWorker Bulk Message #%d' % i,
+                                      to=os.environ['GMAIL_RCPT'],
+                                      text='Hello'),
+                              priority=PRIORITY_BULK)
+        gmail_worker.send(Message('GMailWorker Urgent Message',
+                                  to=os.environ['GMAIL_RCPT'],
+                                  text='Hello'),
+                          priority=PRIORITY_HIGH)
+        self.assertRaises(ValueError,gmail_worker.send,None,priority=99)
+        self.assertRaises(ValueError,gmail_worker.send,None,priority=1.0)
+        gmail_worker.close()
+        gmail_worker.worker.join()
+        for w in gmail_worker.reserved_workers:
+            w.join()
+        stats = gmail_worker.stats()
+        self.assertEqual(stats['high']['count'],1)
+        self.assertEqual(stats['bulk']['count'],5)
+        self.assertLess(stats['high']['wait_max'],stats['bulk']['wait_max'])
+
     def test_logging(self):
         logger = logging.getLogger("GMailLogger")
         logger.setLevel(logging.DEBUG)
@@ -85,9 +113,97 @@ class GMailTest(unittest.TestCase):
 
         gh.close()
 
+class PrepareTest(unittest.TestCase):
+
+    def test_prepare(self):
+        gmail = GMail('A.User <user@gmail.com>','password')
+        msg = Message('Prepare',to='A <a@xyz.com>',cc='b@xyz.com',bcc='c@xyz.com',text='Hello')
+        self.assertEqual(gmail.prepare(msg),['a@xyz.com','b@xyz.com','c@xyz.com'])
+        self.assertEqual(msg['From'],'A.User <user@gmail.com>')
+        self.assertEqual(msg['Reply-To'],'A.User <user@gmail.com>')
+        self.assertIsNotNone(msg['Date'])
+        self.assertIsNotNone(msg['Message-ID'])
+        self.assertIsNone(msg['Bcc'])
+        msg2 = Message('Prepare',to='a@xyz.com',text='Hello')
+        gmail.prepare(msg2)
+        self.assertNotEqual(msg['Message-ID'],msg2['Message-ID'])
+
+    def test_prepare_headers_changed(self):
+        gmail = GMail('user@gmail.com','password')
+        msg = Message('Prepare',to='a@xyz.com',text='Hello')
+        msg.add_header('Cc','c@xyz.com')
+        msg.replace_header('To','new@xyz.com')
+        self.assertEqual(gmail.prepare(msg),['new@xyz.com','c@xyz.com'])
+
+    def test_prepare_mime(self):
+        gmail = GMail('user@gmail.com','password')
+        msg = MIMEBase('text','plain')
+        msg['To'] = 'a@xyz.com'
+        msg['Bcc'] = 'B <b@xyz.com>'
+        self.assertEqual(gmail.prepare(msg),['a@xyz.com','b@xyz.com'])
+        self.assertEqual(gmail.prepare(msg,['x@xyz.com']),['x@xyz.com'])
+
+class LaneSchedulerTest(unittest.TestCase):
+
+    def _scheduler(self,items,weights=(8,4,1)):
+        try:
+            from queue import Queue
+        except ImportError:
+            from Queue import Queue
+        q = Queue()
+        for item in items:
+            q.put(item)
+        q.put(('QUIT',None,None,None))
+        s = _LaneScheduler(q,weights)
+        s.reader.join()
+        return s
+
+    def _drain(self,s):
+        result = []
+        while True:
+            msg,rcpt,priority,queued = s.get()
+            if msg == 'QUIT':
+                return result
+            result.append(msg)
+
+    def test_priority(self):
+        items = [ ('b%d' % i,None,PRIORITY_BULK,0) for i in range(10) ] + \
+                [ ('h%d' % i,None,PRIORITY_HIGH,0) for i in range(2) ]
+        order = self._drain(self._scheduler(items))
+        # Urgent messages are not queued behind the bulk backlog
+        self.assertEqual(order[:2],['h0','h1'])
+        self.assertEqual(len(order),12)
+
+    def test_weighted_fairness(self):
+        items = [ ('h%d' % i,None,PRIORITY_HIGH,0) for i in range(100) ] + \
+                [ ('n%d' % i,None,PRIORITY_NORMAL,0) for i in range(100) ] + \
+                [ ('b%d' % i,None,PRIORITY_BULK,0) for i in range(100) ]
+        first = self._drain(self._scheduler(items))[:130]
+        # Lanes served in proportion to weights (8:4:1) and bulk not starved
+        self.assertEqual([ sum(1 for m in first if m[0] == c) for c in 'hnb' ],[80,40,10])
+
+    def test_invalid_priority(self):
+        items = [ ('n0',None,PRIORITY_NORMAL,0),
+                  ('bad',None,1.0,0),
+                  ('n1',None,PRIORITY_NORMAL,0) ]
+        s = self._scheduler(items)
+        # Reader stops on the bad item - queued messages drain then QUIT
+        self.assertTrue(s.closing)
+        self.assertEqual(self._drain(s),['n0'])
+
+    def test_idle_lane_reset(self):
+        items = [ ('h0',None,PRIORITY_HIGH,0) ] + \
+                [ ('n%d' % i,None,PRIORITY_NORMAL,0) for i in range(5) ]
+        s = self._scheduler(items)
+        self.assertEqual([ s.get()[0] for i in range(3) ],['h0','n0','n1'])
+        # HIGH returns after a NORMAL-only period - served first, no stale debt
+        with s.cond:
+            s.lanes[PRIORITY_HIGH].append(('h1',None,PRIORITY_HIGH,0))
+        self.assertEqual(s.get()[0],'h1')
+        self.assertEqual(self._drain(s),['n2','n3','n4'])
+
 if __name__ == '__main__':
-    if os.getenv('GMAIL_ACCOUNT') and os.getenv('GMAIL_PASSWD') and os.getenv('GMAIL_RCPT'):
-        unittest.main()
-    else:
-        print("Must set GMAIL_ACCOUNT, GMAIL_PASSWD, GMAIL_RCPT environment variables")
+    if not _live:
+        print("Must set GMAIL_ACCOUNT, GMAIL_PASSWD, GMAIL_RCPT environment variables to run GMailTest")
+    unittest.main()
     
@@ -2,7 +2,7 @@
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import os,unittest
+import os,subprocess,sys,unittest
 from email.mime.base import MIMEBase
 from textwrap import dedent
 
@@ -50,6 +50,18 @@ class MessageTest(unittest.TestCase):
                           ['multipart/mixed','multipart/alternative','text/plain',
                               'text/html','application/unknown','text/x-python'])
 
+class LazyImportTest(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info < (3,7),"Module __getattr__ requires Python 3.7+")
+    def test_lazy_import(self):
+        code = ("import gmail,sys\n"
+                "print(','.join(m for m in ('smtplib','multiprocessing','email.mime.text') if m in sys.modules))\n"
+                "gmail.Message('Lazy',to='xyz@xyz.com',text='text')\n"
+                "print('email.mime.text' in sys.modules)\n")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.check_output([sys.executable,'-c',code],cwd=root)
+        self.assertEqual(out.decode('ascii').split(),['True'])
+
 if __name__ == '__main__':
     unittest.main()
     